@@ -1,8 +1,7 @@
-from collections import namedtuple
-from dataclasses import dataclass, InitVar, asdict
+from dataclasses import dataclass, InitVar, fields
 
 
-@dataclass
+@dataclass(slots=True)
 class RetailerConfig:
     """
     Параметры отчета для выбранной компании.
@@ -29,7 +28,7 @@ class RetailerConfig:
     table_header_style: str = "Headline 1"
 
 
-@dataclass
+@dataclass(slots=True)
 class ReportConfig:
     """
     Параметры формирования отчета
@@ -46,22 +45,41 @@ class ReportConfig:
     category: str
 
 
+@dataclass(slots=True, frozen=True)
+class Parameters:
+    """
+    Итоговые параметры отчета: объединение полей RetailerConfig и ReportConfig.
+    """
+
+    company_name: str
+    table_display_name: str
+    excel_table_style_name: str
+    start_summation_row: str
+    table_header_style: str
+    report_period: str
+    category: str
+
+
 @dataclass(slots=True)
 class Config:
     retailer_config: InitVar[RetailerConfig]
     report_config: InitVar[ReportConfig]
-    parameters: namedtuple = None
+    parameters: Parameters = None
 
     def __post_init__(
         self, retailer_config: RetailerConfig, report_config: ReportConfig
     ):
         """
-        Формирует параметры конфигурации в виде именованного кортежа.
+        Формирует параметры конфигурации в виде экземпляра Parameters.
         """
-        ReturnTuple = namedtuple(
-            "ReturnTuple",
-            list((asdict(retailer_config) | asdict(report_config)).keys()),
-        )
-        self.parameters = ReturnTuple(
-            **(asdict(retailer_config) | asdict(report_config))
+        self.parameters = Parameters(
+            **_fields_dict(retailer_config), **_fields_dict(report_config)
         )
+
+
+def _fields_dict(config: RetailerConfig | ReportConfig) -> dict:
+    """
+    Поля плоского dataclass в виде словаря. В отличие от asdict, значения
+    не копируются рекурсивно: все поля конфигураций — строки.
+    """
+    return {f.name: getattr(config, f.name) for f in fields(config)}
@@ -1,11 +1,13 @@
-import os
+import hashlib
+import io
 import time
 
 import streamlit as st
+from streamlit.runtime.uploaded_file_manager import UploadedFile
 from config.configurations import Config, ReportConfig
 from processing.dns_extended import dns_retailer_config_extended, run_dns_extended
 from processing.mvm import mvm_retailer_config, run_mvm
-from utils.io import DEFAULT_SAVE_PATH, Writer
+from utils.io import Writer
 from utils.mappings import replacer
 
 st.set_page_config(page_title="СберДевайс", page_icon="sber_logo.png", layout="wide")
@@ -25,6 +27,27 @@ st.markdown("""
 # Товарные категории
 categories = ["Медиаплееры", "СберДевайс", "Аксессуары", "Телевизоры", "Лампы"]
 
+
+@st.cache_data(
+    max_entries=4,
+    show_spinner=False,
+    hash_funcs={UploadedFile: lambda f: hashlib.blake2b(f.getvalue()).digest()},
+)
+def load_report(file, retailer):
+    """
+    Обработка загруженного файла выбранной сети.
+    Результат кэшируется по содержимому файла, поэтому повторный запуск
+    для того же файла и сети не перечитывает Excel.
+    """
+    match retailer:
+        case "МВМ":
+            return run_mvm(file)
+        case "ДНС":
+            return run_dns_extended(file)
+        case _:
+            raise ValueError("Неизвестное название сети.")
+
+
 sidebar = st.sidebar
 sidebar.header("Загрузка файла и ввод параметров")
 
@@ -63,47 +86,44 @@ if uploaded is not None:
 
         match retailer:
             case "МВМ":
-                result = run_mvm(uploaded)
                 config = Config(mvm_retailer_config, report_config)
             case "ДНС":
-                result = run_dns_extended(uploaded)
                 config = Config(dns_retailer_config_extended, report_config)
             case _:
                 raise ValueError("Неизвестное название сети.")
+        result = load_report(uploaded, retailer)
         return result, config
 
     st.divider()
 
     if process_button:
-        fname = "current_result.xlsx"
-
-        if fname in os.listdir(DEFAULT_SAVE_PATH):
-            os.remove(DEFAULT_SAVE_PATH.joinpath(fname))
+        # Книга собирается в памяти и сразу отдается в кнопку скачивания
+        buffer = io.BytesIO()
 
         with st.spinner("Работаю...", show_time=True):
             result, config = process()
             writer = Writer(config)
-            writer.export_to_xls(result, fname)
+            writer.export_to_xls(result, buffer)
             badge = st.badge("Готово!", color="green", icon=":material/check:")
 
         if result is not None:
             st.subheader("Обработанные данные", divider=True)
             st.dataframe(result, use_container_width=True, hide_index=True)
-            time.sleep(2)
-            badge.empty()
         else:
             st.write("Ошибка обработки. В таблице нет данных.")
 
         if result is not None:
             output_fname = f"{selected_category}_{retailer}_{period}.xlsx"
 
-            with open(DEFAULT_SAVE_PATH.joinpath(fname), "rb") as f:
-                file_object = f.read()
-                download_button = st.download_button(
-                    "Скачать файл",
-                    data=file_object,
-                    file_name=output_fname,
-                    on_click=lambda: os.remove(DEFAULT_SAVE_PATH.joinpath(fname)),
-                    help="Скачать результат в формате .xlsx",
-                    icon=":material/download:",
-                )
+            download_button = st.download_button(
+                "Скачать файл",
+                data=buffer.getvalue(),
+                file_name=output_fname,
+                help="Скачать результат в формате .xlsx",
+                icon=":material/download:",
+            )
+
+            # Отметка «Готово!» убирается, когда страница уже отрисована,
+            # чтобы пауза не задерживала таблицу и кнопку скачивания
+            time.sleep(2)
+            badge.empty()
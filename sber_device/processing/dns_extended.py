@@ -2,10 +2,11 @@ from pathlib import Path
 from dataclasses import dataclass, InitVar, field
 from typing import ClassVar
 
+import numpy as np
 import pandas as pd
-from openpyxl import load_workbook
 
 from config.configurations import RetailerConfig
+from utils.io import read_excel
 
 dns_retailer_config_extended = RetailerConfig(
     company_name="ДНС",
@@ -21,7 +22,7 @@ class ExtendedReport:
     """
     Обработчик расширенного отчёта ДНС.
 
-    Структура определяется динамически по объединённым ячейкам:
+    Структура определяется динамически по подписям объединённых ячеек:
     - «Изделие» — ширина определяет количество полей товара
     - «Итого» — ширина = кол-во метрик, высота = глубина заголовка
     - Магазины — объединённые ячейки переменной ширины с метриками под ними
@@ -33,9 +34,15 @@ class ExtendedReport:
 
     # Структура файла (заполняется в _parse_structure)
     _product_fields: list = field(init=False, default_factory=list)
-    _shops: list = field(init=False, default_factory=list)
     _data_start_row: int = field(init=False, default=0)
 
+    # Магазины в виде параллельных массивов: названия, коды, словарь метрик
+    # и матрица столбцов (n_shops, n_metrics), -1 — метрики у магазина нет
+    _shop_names: np.ndarray | None = field(init=False, default=None)
+    _shop_codes: np.ndarray | None = field(init=False, default=None)
+    _metric_vocabulary: list[str] = field(init=False, default_factory=list)
+    _col_index: np.ndarray | None = field(init=False, default=None)
+
     # Маппинг полей товара из файла → имена выходных колонок
     PRODUCT_FIELD_MAP: ClassVar[dict[str, str]] = {
         "Код": "Артикул",
@@ -51,11 +58,11 @@ class ExtendedReport:
     }
 
     # Целочисленные поля
-    INTEGER_FIELDS: ClassVar[set[str]] = {
+    INTEGER_FIELDS: ClassVar[frozenset[str]] = frozenset({
         "Продажи, шт",
         "Остатки, шт",
         "Остатки в пути",
-    }
+    })
 
     # Базовые колонки (всегда присутствуют)
     BASE_COLNAMES: ClassVar[list[str]] = [
@@ -77,131 +84,103 @@ class ExtendedReport:
     ]
 
     def __post_init__(self, df_path: Path | str) -> None:
-        self._parse_structure(df_path)
-        self.raw_df = pd.read_excel(df_path, header=None, dtype=object)
+        self.raw_df = read_excel(df_path, header=None, dtype=object)
         if self.raw_df is None or self.raw_df.empty:
             raise ValueError("Нет данных для обработки")
+        self._parse_structure()
 
-    def _parse_structure(self, df_path: Path | str) -> None:
-        """
-        Определить структуру файла по объединённым ячейкам (openpyxl, 1-based).
-        Результаты сохраняются с индексами pandas (0-based).
+    def _parse_structure(self) -> None:
         """
-        wb = load_workbook(df_path)
-        ws = wb.active
-
-        # Карта объединений: (row, col) → MergedCellRange
-        merge_map = {}
-        for m in ws.merged_cells.ranges:
-            merge_map[(m.min_row, m.min_col)] = m
-
-        def mwidth(row, col):
-            m = merge_map.get((row, col))
-            return m.max_col - m.min_col + 1 if m else 1
+        Определить структуру файла по строкам заголовка (индексы pandas, 0-based).
 
-        def mheight(row, col):
-            m = merge_map.get((row, col))
-            return m.max_row - m.min_row + 1 if m else 1
+        Подпись объединённой ячейки стоит в её левом столбце, остальные столбцы
+        пустые. Поэтому блок первой строки («Изделие», «Итого», магазин)
+        продолжается до следующей непустой подписи — как ffill подписей по
+        столбцам, без разбора объединений openpyxl.
+        """
+        top = self.raw_df.iloc[0]
+        starts = np.flatnonzero(top.notna().to_numpy())
+        ends = np.append(starts[1:], len(top))
+        block_end = dict(zip(starts, ends))
 
         # 1. «Изделие» — первая ячейка R1
-        izd_col = None
-        for c in range(1, ws.max_column + 1):
-            if ws.cell(1, c).value == "Изделие":
-                izd_col = c
-                break
-        if izd_col is None:
+        izd = np.flatnonzero(top.eq("Изделие").to_numpy())
+        if not len(izd):
             raise KeyError("Не найден раздел 'Изделие' в первой строке")
-
-        izd_w = mwidth(1, izd_col)
-        izd_end = izd_col + izd_w - 1
+        izd_col = izd[0]
+        izd_end = block_end[izd_col]
 
         # 2. Находим строку с полем "Код" — это базовая строка для полей товара
-        product_row = None
-        for try_row in [2, 3]:
-            for c in range(izd_col, izd_end + 1):
-                if ws.cell(try_row, c).value == "Код":
-                    product_row = try_row
-                    break
-            if product_row:
-                break
-        
-        if product_row is None:
+        has_code = self.raw_df.iloc[1:3, izd_col:izd_end].eq("Код").any(axis=1)
+        if not has_code.any():
             raise KeyError("Не найдено поле 'Код' в области 'Изделие'")
-        
+        product_row = has_code.idxmax()
+
         # 3. Поля товара — найденная строка с "Код", внутри ширины «Изделие»
-        self._product_fields = []
-        c = izd_col
-        while c <= izd_end:
-            val = ws.cell(product_row, c).value
-            if val:
-                w = mwidth(product_row, c)
-                self._product_fields.append({
-                    "name": str(val),
-                    "pd_col": c - 1,  # pandas 0-based
-                })
-                c += w
-            else:
-                c += 1
-
-        # 3. «Итого» — сразу после блока «Изделие»
-        itogo_col = izd_end + 1
-        if ws.cell(1, itogo_col).value != "Итого":
+        product_fields = self.raw_df.iloc[product_row, izd_col:izd_end].dropna()
+        self._product_fields = [
+            {"name": str(val), "pd_col": col} for col, val in product_fields.items()
+        ]
+
+        # 4. «Итого» — сразу после блока «Изделие»
+        itogo_col = izd_end
+        found = top.iloc[itogo_col] if itogo_col < len(top) else None
+        if found != "Итого":
             raise KeyError(
-                f"Ожидался 'Итого' в колонке {itogo_col}, "
-                f"найдено: {ws.cell(1, itogo_col).value}"
+                f"Ожидался 'Итого' в колонке {itogo_col + 1}, найдено: {found}"
             )
-        itogo_w = mwidth(1, itogo_col)
-        itogo_h = mheight(1, itogo_col)
-
-        # Строка с именами метрик — сразу под вертикальным объединением «Итого»
-        metric_row = 1 + itogo_h
-
-        # 4. Начало данных — строка после метрик
-        data_row = metric_row + 1
-        # Если первая строка данных — итоги по категории (объединена на всю ширину «Изделие»), пропускаем
-        m = merge_map.get((data_row, izd_col))
-        if m and (m.max_col - m.min_col + 1) == izd_w:
-            data_row += 1
-        self._data_start_row = data_row - 1  # pandas 0-based
-
-        # 5. Магазины — после блока «Итого», идём по объединениям
-        self._shops = []
-        c = itogo_col + itogo_w
-        max_col = ws.max_column
-        while c <= max_col:
-            val = ws.cell(1, c).value
-            if val:
-                w = mwidth(1, c)
-                code = ws.cell(2, c).value
-
-                # Метрики внутри блока магазина (в строке metric_row)
-                metrics = {}
-                mc = c
-                while mc < c + w:
-                    mval = ws.cell(metric_row, mc).value
-                    if mval:
-                        mw = mwidth(metric_row, mc)
-                        metrics[str(mval)] = mc - 1  # pandas 0-based
-                        mc += mw
-                    else:
-                        mc += 1
-
-                self._shops.append({
-                    "name": str(val),
-                    "code": str(code) if code else "",
-                    "metrics": metrics,
-                })
-                c += w
-            else:
-                c += 1
-
-        wb.close()
+
+        # Строка с именами метрик — первая непустая под вертикальным объединением «Итого»
+        metric_row = self.raw_df.iloc[1:, itogo_col].first_valid_index()
+        if metric_row is None:
+            raise KeyError("Не найдены названия метрик под 'Итого'")
+
+        # 5. Начало данных — строка после метрик. Итоги по категории и прочие
+        # строки без числового артикула отсеиваются в create_report
+        self._data_start_row = metric_row + 1
+
+        # 6. Магазины — блоки после «Итого», метрики в строке metric_row
+        shop_starts = starts[starts > itogo_col]
+        codes = self.raw_df.iloc[1, shop_starts]
+        self._shop_names = top.iloc[shop_starts].astype(str).to_numpy(dtype=object)
+        self._shop_codes = (
+            codes.astype(str).where(codes.notna(), "").to_numpy(dtype=object)
+        )
+
+        # Столбцы метрик всех магазинов сразу: номер магазина — по началу
+        # блока, номер метрики — по общему словарю выходных названий. Колонки
+        # «Итого» в словарь не попадают: метрика без магазинов дала бы пустую колонку
+        first_shop = shop_starts[0] if len(shop_starts) else len(top)
+        metric_names = self.raw_df.iloc[metric_row, first_shop:].dropna()
+        metric_cols = metric_names.index.to_numpy()
+        shop_ids = np.searchsorted(shop_starts, metric_cols, side="right") - 1
+        metric_ids, vocabulary = pd.factorize(
+            metric_names.astype(str).map(lambda m: self.METRIC_MAPPING.get(m, m))
+        )
+        # Границы блока магазина берутся до следующей подписи, поэтому колонки
+        # после последнего магазина или блок без названия попадают к соседнему
+        # магазину. Повтор метрики в блоке означает, что структура разобрана
+        # неверно: молча перезаписывать столбец нельзя
+        pairs = shop_ids * len(vocabulary) + metric_ids
+        unique_pairs, counts = np.unique(pairs, return_counts=True)
+        if (counts > 1).any():
+            shop_id, metric_id = divmod(unique_pairs[counts > 1][0], len(vocabulary))
+            raise KeyError(
+                f"Метрика '{vocabulary[metric_id]}' повторяется в блоке магазина "
+                f"'{self._shop_names[shop_id]}'"
+            )
+
+        self._metric_vocabulary = list(vocabulary)
+        self._col_index = np.full(
+            (len(shop_starts), len(vocabulary)), -1, dtype=np.int32
+        )
+        self._col_index[shop_ids, metric_ids] = metric_cols
 
     def create_report(self) -> None:
         """
         Сборка отчёта.
         """
-        if not self._shops:
+        if not len(self._shop_names):
             raise ValueError("Не найдено ни одного магазина в данных")
 
         # Маппинг полей товара: выходное_имя → pandas col
@@ -212,40 +191,33 @@ class ExtendedReport:
                 product_col_map[output_name] = pf["pd_col"]
 
         art_col = product_col_map.get("Артикул", 0)
-        all_rows = []
-
-        for row_idx in range(self._data_start_row, len(self.raw_df)):
-            artcode = self.raw_df.iloc[row_idx, art_col]
-
-            # Пропускаем строки без числового артикула (итоги, доли и т.п.)
-            if pd.isna(artcode):
-                continue
-            if pd.to_numeric(artcode, errors="coerce") is None or pd.isna(
-                pd.to_numeric(artcode, errors="coerce")
-            ):
-                continue
-
-            # Данные товара
-            product_data = {
-                name: self.raw_df.iloc[row_idx, col]
-                for name, col in product_col_map.items()
-            }
-
-            for shop in self._shops:
-                row_data = {
-                    **product_data,
-                    "Магазин": shop["name"],
-                    "Код магазина": shop["code"],
-                }
-
-                for metric_name, col_idx in shop["metrics"].items():
-                    value = self.raw_df.iloc[row_idx, col_idx]
-                    output_name = self.METRIC_MAPPING.get(metric_name, metric_name)
-                    row_data[output_name] = value if pd.notna(value) else 0
-
-                all_rows.append(row_data)
-
-        self.df = pd.DataFrame(all_rows)
+        rows = self.raw_df.iloc[self._data_start_row :]
+
+        # Пропускаем строки без числового артикула (итоги, доли и т.п.)
+        # до разворачивания по магазинам
+        valid = pd.to_numeric(rows.iloc[:, art_col], errors="coerce").notna()
+
+        # Значения отобранных строк одним блоком + пустой столбец в конце:
+        # индекс -1 используется для метрик, которых нет у магазина
+        data = rows.to_numpy()[valid.to_numpy()]
+        data = np.column_stack([data, np.full(len(data), np.nan, dtype=object)])
+        n_products = len(data)
+        n_shops = len(self._shop_names)
+
+        # Длинный формат: каждая строка товара повторяется для всех магазинов
+        columns = {
+            name: np.repeat(data[:, col], n_shops)
+            for name, col in product_col_map.items()
+        }
+        columns["Магазин"] = np.tile(self._shop_names, n_products)
+        columns["Код магазина"] = np.tile(self._shop_codes, n_products)
+
+        # Метрики всех магазинов одной выборкой: (n_products, n_shops, n_metrics)
+        values = data[:, self._col_index]
+        for metric_id, output_name in enumerate(self._metric_vocabulary):
+            columns[output_name] = values[:, :, metric_id].ravel()
+
+        self.df = pd.DataFrame(columns)
 
         # Преобразование типов
         self.df["Артикул"] = pd.to_numeric(
@@ -255,17 +227,21 @@ class ExtendedReport:
             self.df["Код магазина"], errors="coerce"
         ).fillna(0).astype(int)
 
-        for col in self.df.columns:
-            if col in self.BASE_COLNAMES:
-                continue
-            if col in self.INTEGER_FIELDS:
-                self.df[col] = pd.to_numeric(
-                    self.df[col], errors="coerce"
-                ).fillna(0).astype(int)
-            else:
-                self.df[col] = pd.to_numeric(
-                    self.df[col], errors="coerce"
-                ).fillna(0)
+        # Магазин и его код повторяются в каждой строке товара — храним их
+        # как категории: меньше памяти, сортировка идет по кодам категорий.
+        # Категории упорядочены по значению, поэтому порядок строк прежний
+        self.df[["Магазин", "Код магазина"]] = self.df[
+            ["Магазин", "Код магазина"]
+        ].astype("category")
+
+        # Метрики приводятся одним блоком: to_numeric + fillna, затем
+        # однократное приведение целочисленных полей
+        base = self.df[self.df.columns.intersection(self.BASE_COLNAMES, sort=False)]
+        metrics = self.df.drop(columns=base.columns)
+        metrics = metrics.apply(pd.to_numeric, errors="coerce").fillna(0)
+        int_cols = [col for col in metrics.columns if col in self.INTEGER_FIELDS]
+        metrics[int_cols] = metrics[int_cols].astype(np.int64)
+        self.df = pd.concat([base, metrics], axis=1)
 
         # Упорядочиваем: базовые колонки + найденные метрики
         found_metrics = [m for m in self.METRIC_ORDER if m in self.df.columns]
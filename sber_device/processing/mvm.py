@@ -1,5 +1,6 @@
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 
 from utils.io import read_excel
@@ -15,45 +16,71 @@ mvm_retailer_config = RetailerConfig(
 )
 
 
-def get_mvm_data(data: pd.DataFrame) -> pd.DataFrame:
-    # add non-NA value in the columns with item names so that this is not deleting during dropna action
-    data.iloc[0, 6] = "city"
-    data.iloc[1, 6] = "code"
+def _is_used_column(col: int) -> bool:
+    """
+    Нужна ли колонка исходного файла для обработки: код и название модели
+    (5 и 6) и данные по магазинам (с 33-й).
+    """
+    return col in (5, 6) or col >= 33
 
-    data = data.drop(columns=data.iloc[:, 0:5].columns).dropna(subset=["Unnamed: 6"])
-    cols_to_drop = data.iloc[:, 2:28].columns
-    data = data.drop(columns=cols_to_drop)
-    data = data.rename(columns={"Unnamed: 5": "model_code", "Unnamed: 6": "model"})
 
-    data.loc[0] = data.loc[0].ffill()
-    data.loc[1] = data.loc[1].ffill()
+def get_mvm_data(data: pd.DataFrame) -> pd.DataFrame:
+    # add non-NA value in the columns with item names so that this is not deleting during dropna action
+    data.loc[0, 6] = "city"
+    data.loc[1, 6] = "code"
+
+    # Лишние колонки не читаются из файла (см. _is_used_column), остаются код
+    # и название модели (5 и 6) и данные по магазинам
+    data = data.dropna(subset=[6])
+    data = data.rename(columns={5: "model_code", 6: "model"})
+
+    # ffill строк с городами и кодами магазинов одним проходом по массиву:
+    # для каждой ячейки берется номер последней непустой колонки слева
+    head = data.iloc[:2].to_numpy()
+    filled = np.where(pd.isna(head), 0, np.arange(head.shape[1]))
+    np.maximum.accumulate(filled, axis=1, out=filled)
+    data.iloc[:2] = np.take_along_axis(head, filled, axis=1)
     data = data.reset_index(drop=True)
 
-    # Encode model_code into model for uniqueness during transpose
-    data.loc[3:, "model"] = (
-        data.loc[3:, "model_code"].astype(str) + "|||" + data.loc[3:, "model"].astype(str)
+    # Транспонирование через NumPy: строки 0-2 (город, код магазина,
+    # наименование метрики) становятся служебными колонками, строки моделей —
+    # колонками с двумя уровнями model_code и model
+    block = data.drop(columns=["model_code", "model"]).to_numpy()
+    ids = pd.DataFrame(block[:3].T, columns=["city", "code", "Наименование"])
+    # Код и название модели — строки, как и раньше после склейки через "|||"
+    models = pd.MultiIndex.from_arrays(
+        [
+            data["model_code"].iloc[3:].astype(str),
+            data["model"].iloc[3:].astype(str),
+        ],
+        names=["model_code", "model"],
     )
 
-    data = data.drop(columns="model_code")
-    data = data.set_index(["model"]).T.reset_index(drop=True).fillna(0).infer_objects(copy=False)
-
-    # melting
-    data = data.melt(id_vars=["city", "code", "Наименование"])
-
-    # Split model back into model_code and model name
-    data[["model_code", "model"]] = data["model"].str.split("|||", n=1, expand=True, regex=False)
-
-    data = (
-        data.groupby(["model_code", "model", "city", "code", "Наименование"], as_index=False)
-        .agg({"value": "sum"})
-    )
-    data = (
-        data.set_index(["model_code", "model", "city", "code", "Наименование"])
-        .unstack(4)
-        .reset_index()
-    )
-    # Flatten multi-level columns after unstack
-    data.columns = [col[1] if col[1] else col[0] for col in data.columns]
+    # Модели могут повторяться, поэтому служебные колонки уходят в индекс,
+    # а значения приводятся к числам до melt: суммирование идет по float
+    numeric = pd.to_numeric(block[3:].T.ravel(), errors="coerce")
+    values = pd.DataFrame(
+        numeric.reshape(block.shape[1], len(models)),
+        index=pd.MultiIndex.from_frame(ids.where(ids.notna(), 0)),
+        columns=models,
+    ).fillna(0)
+
+    # melting: уровни колонок становятся столбцами model_code и model
+    data = values.melt(ignore_index=False).reset_index()
+
+    # Ключи группировки — категории: хешируются целочисленные коды, а не строки
+    keys = ["model_code", "model", "city", "code", "Наименование"]
+    data[keys] = data[keys].astype("category")
+
+    # Суммирование дублей и разворот метрик в колонки одним pivot_table;
+    # observed=True — только встречающиеся сочетания категорий
+    data = data.pivot_table(
+        index=keys[:4],
+        columns="Наименование",
+        values="value",
+        aggfunc="sum",
+        observed=True,
+    ).reset_index()
 
     col_names = [
         "Артикул",
@@ -67,14 +94,10 @@ def get_mvm_data(data: pd.DataFrame) -> pd.DataFrame:
     ]
     data.columns = col_names
 
-    # filter non zero values and re-arrange columns
-    data = data.loc[
-        lambda r: (r["Остатки, шт"] != 0)
-        | (r["Остатки, руб"] != 0)
-        | (r["Продажи, руб"] != 0)
-        | (r["Продажи, шт"] != 0)
-    ]
-    data = data.iloc[:, [0, 1, 2, 3, 7, 6, 4, 5]]
+    # filter non zero values and re-arrange columns in a single iloc
+    values = data[["Остатки, шт", "Остатки, руб", "Продажи, руб", "Продажи, шт"]]
+    non_zero = (values.to_numpy() != 0).any(axis=1)
+    data = data.iloc[non_zero, [0, 1, 2, 3, 7, 6, 4, 5]]
     data = data.sort_values(by=["Артикул", "Город"]).reset_index(drop=True)
 
     return data
@@ -83,9 +106,8 @@ def get_mvm_data(data: pd.DataFrame) -> pd.DataFrame:
 def run_mvm(path: Path | str, header=2):
     """
     Вспомогательная функция для учета нового формата в исходных таблицах МВМ.
-    Сначала запускается первоначальный вариант функции, и в случае ошибки
-    запускается вариант, заточенный под новую структуру (просто добавились
-    пустые строки в начале файла)
+    Файл читается один раз без заголовка, строки до заголовка таблицы
+    (включительно) отбрасываются, колонки адресуются по номеру.
 
     Parameters
     ----------
@@ -95,17 +117,16 @@ def run_mvm(path: Path | str, header=2):
         Номер строки, где начинается заголовок таблицы
         По умолчанию 2 (новый формат отчета)
     """
-    try:
-        data = read_excel(path, header=header)
-    except KeyError as e:
-        print(e)
-        data = read_excel(path, header=0)
+    raw = read_excel(path, header=None, usecols=_is_used_column)
+    data = raw.iloc[header + 1 :].reset_index(drop=True)
 
     # Обрезаем фильтровые строки: ищем первую строку с данными в per-store колонках
     # (col 6 = NaN, но колонки 33+ содержат данные — это строка с городами)
-    for i in range(len(data)):
-        if pd.isna(data.iloc[i, 6]) and data.iloc[i, 33:].notna().any():
-            data = data.iloc[i:].reset_index(drop=True)
-            break
+    is_city_row = (
+        data[6].isna().to_numpy()
+        & data.loc[:, 33:].notna().to_numpy().any(axis=1)
+    )
+    if is_city_row.any():
+        data = data.iloc[np.argmax(is_city_row) :].reset_index(drop=True)
 
     return get_mvm_data(data=data)
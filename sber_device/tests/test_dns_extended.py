@@ -0,0 +1,101 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from openpyxl import Workbook
+
+from processing.dns_extended import run_dns_extended
+
+# Метрики под «Итого» (строка 3 заголовка)
+ITOGO_METRICS = ["Кол-во", "Ост. кол-во", "Ост. пути", "Себестоимость без НДС"]
+
+# Результат исходной версии для make_report: сортировка по коду модели
+# (как числу) и магазину, пропуски метрик — 0, «Ост. пути» только в «Итого»
+EXPECTED_ROWS = [
+    [2, "Товар А", 1001, "S1", 101, 2, 0, 1.25],
+    [2, "Товар А", 1001, "S2", 102, 3, 6, 0.0],
+    [9, "Товар В", 1003, "S1", 101, 0, 1, 3.5],
+    [9, "Товар В", 1003, "S2", 102, 1, 0, 0.0],
+    [16, "Товар Б", 1002, "S1", 101, 1, 2, 0.5],
+    [16, "Товар Б", 1002, "S2", 102, 2, 2, 0.0],
+]
+
+
+def make_report(path: Path, extra_column: bool = False) -> None:
+    """
+    Небольшой расширенный отчёт ДНС с объединёнными ячейками, как в выгрузке:
+    «Изделие» (3 поля), «Итого» (4 метрики), магазины S1 (3 метрики)
+    и S2 (2 метрики), строка итогов по категории без артикула.
+
+    Parameters
+    ----------
+    path : Path
+        Путь для сохранения файла.
+    extra_column : bool
+        Добавить после S2 колонку «Кол-во» вне объединения магазина.
+    """
+    wb = Workbook()
+    ws = wb.active
+
+    top = ["Изделие", None, None, "Итого", None, None, None]
+    top += ["S1", None, None, "S2", None]
+    codes = [None] * 7 + [101, None, None, 102, None]
+    header = ["Код", "Товар", "КодПроизводителя"] + ITOGO_METRICS
+    header += ["Кол-во", "Ост. кол-во", "Себестоимость без НДС"]
+    header += ["Кол-во", "Ост. кол-во"]
+    rows = [
+        ["Итого по категории", None, None, 9, 9, 9, 9, 9, 9, 9, 9, 9],
+        [1002, "Товар Б", 16, 3, 4, 0, 1.5, 1, 2, 0.5, 2, 2],
+        [1001, "Товар А", 2, 5, 6, 1, 2.5, 2, None, 1.25, 3, 6],
+        [1003, "Товар В", 9, 1, 1, 0, 3.5, None, 1, 3.5, 1, None],
+    ]
+    if extra_column:
+        header.append("Кол-во")
+        for row in rows:
+            row.append(13)
+
+    for row in [top, codes, header, *rows]:
+        ws.append(row)
+    for cells in ("A1:C2", "D1:G2", "H1:J1", "K1:L1", "A4:C4"):
+        ws.merge_cells(cells)
+    wb.save(path)
+
+
+class ExtendedReportParityTest(unittest.TestCase):
+    """
+    Сверка разбора структуры по подписям заголовка с исходным разбором по
+    объединённым ячейкам openpyxl (ожидаемые значения получены исходной версией).
+    """
+
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = Path(tmp.name) / "dns.xlsx"
+
+    def test_matches_merged_cell_parsing(self) -> None:
+        make_report(self.path)
+        df = run_dns_extended(self.path)
+
+        self.assertEqual(
+            list(df.columns),
+            [
+                "Код модели",
+                "Наименование",
+                "Артикул",
+                "Магазин",
+                "Код магазина",
+                "Продажи, шт",
+                "Остатки, шт",
+                "Себестоимость без НДС",
+            ],
+        )
+        self.assertEqual(df.astype(object).values.tolist(), EXPECTED_ROWS)
+
+    def test_metric_outside_shop_block_is_rejected(self) -> None:
+        make_report(self.path, extra_column=True)
+        with self.assertRaises(KeyError):
+            run_dns_extended(self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
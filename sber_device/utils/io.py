@@ -1,30 +1,43 @@
-from collections import namedtuple
+import warnings
 from dataclasses import InitVar, dataclass
 from pathlib import Path
-from typing import ClassVar
+from typing import BinaryIO, ClassVar
 
 import pandas as pd
 from openpyxl.workbook import Workbook
-from openpyxl.utils import get_column_letter
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils import column_index_from_string, get_column_letter
 from openpyxl.utils.dataframe import dataframe_to_rows
-from openpyxl.worksheet.table import Table, TableStyleInfo
+from openpyxl.worksheet.filters import AutoFilter
+from openpyxl.worksheet.table import Table, TableColumn, TableStyleInfo
 from openpyxl.styles import numbers, Font
 from openpyxl.worksheet.dimensions import ColumnDimension
 
-from config.configurations import Config
+from config.configurations import Config, Parameters
 
 
 DEFAULT_SAVE_PATH = Path("saved")
 
+# Быстрый движок чтения Excel (python-calamine), openpyxl — запасной вариант
+try:
+    import python_calamine  # noqa: F401
+
+    DEFAULT_ENGINE = "calamine"
+except ImportError:
+    DEFAULT_ENGINE = "openpyxl"
+
 if not DEFAULT_SAVE_PATH.exists():
     DEFAULT_SAVE_PATH.mkdir()
 
 
-def read_excel(path: Path | str, header=0, **kwargs) -> pd.DataFrame:
+def read_excel(
+    path: Path | str, header=0, engine=DEFAULT_ENGINE, **kwargs
+) -> pd.DataFrame:
     """
     Чтение Excel-файла по указанному пути.
+    По умолчанию используется движок calamine, если он установлен.
     """
-    return pd.read_excel(path, header=header, **kwargs)
+    return pd.read_excel(path, header=header, engine=engine, **kwargs)
 
 
 @dataclass
@@ -32,7 +45,7 @@ class Writer:
     destination_path: ClassVar[Path | str] = DEFAULT_SAVE_PATH
 
     input_config: InitVar[Config]
-    config: namedtuple = None
+    config: Parameters = None
 
     def __post_init__(self, input_config: Config):
         if not self.destination_path.exists():
@@ -40,34 +53,40 @@ class Writer:
 
         self.config = input_config.parameters
 
-    def columns_best_fit(self, ws) -> None:
+    def columns_best_fit(self, ws, df: pd.DataFrame) -> None:
         """
-        Make all columns best fit
+        Make all columns fit their longest value or heading.
+
+        Widths are computed from the dataframe up front: bestFit is only
+        resolved by Excel on open and is ignored by many other viewers.
         """
-        column_letters = tuple(
-            get_column_letter(col_number) for col_number in range(1, ws.max_column + 1)
-        )
-        for column_letter in column_letters:
-            dim = ColumnDimension(
-                ws, index=column_letter, bestFit=True, customWidth=True
+        for col_number, column in enumerate(df.columns, start=1):
+            longest = df[column].astype(str).str.len().max()
+            width = max(len(str(column)), 0 if pd.isna(longest) else longest) + 2
+            column_letter = get_column_letter(col_number)
+            ws.column_dimensions[column_letter] = ColumnDimension(
+                ws, index=column_letter, width=width
             )
-            ws.column_dimensions[column_letter] = dim
 
     def export_to_xls(
         self,
         df: pd.DataFrame,
-        fname: str = None,
+        fname: str | BinaryIO = None,
     ) -> None:
         """
         Экспорт данных в таблицу Excel.
 
+        Книга создается в режиме write-only: строки сразу записываются в XML,
+        а не хранятся в памяти как объекты ячеек.
+
         Parameters:
         -----------
         df : pd.DataFrame
             pandas DataFrame для экспорта.
-        fname : str
-            Имя файла. По умолчанию None.
-            Если не задано, будет сформировано автоматически.
+        fname : str | BinaryIO
+            Имя файла или бинарный буфер (например, io.BytesIO), в который
+            записывается книга. По умолчанию None.
+            Если не задано, имя файла будет сформировано автоматически.
 
         Returns:
         None
@@ -75,29 +94,67 @@ class Writer:
 
         x, y = df.shape
         right_bound = get_column_letter(y)
+        start_summation_col = column_index_from_string(self.config.start_summation_row)
 
         # Create workbook and worksheet
-        wb = Workbook()
-        ws = wb.active
-        ws.title = f"{self.config.category}"
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(f"{self.config.category}")
         ws.sheet_view.showGridLines = False
 
+        # Column dimensions have to be set before the first row is written
+        self.columns_best_fit(ws, df)
+
         # Make header and an empty line
-        ws[
-            "A1"
-        ].value = f"{self.config.category} в {self.config.company_name} - {self.config.report_period}"
-        ws["A1"].style = f"{self.config.table_header_style}"
-        ws["A2"] = ""
+        header = WriteOnlyCell(
+            ws,
+            value=f"{self.config.category} в {self.config.company_name} - {self.config.report_period}",
+        )
+        header.style = f"{self.config.table_header_style}"
+        ws.append([header])
+        ws.append([""])
+
+        # Styled cells for numeric columns (from the 3rd one) are created once
+        # and reused: a write-only sheet serializes each row on append
+        number_format = numbers.builtin_format_code(3)
+        bold = Font(bold=True)
+        number_cells = [WriteOnlyCell(ws) for _ in range(2, y)]
+        for cell in number_cells:
+            cell.number_format = number_format
 
         # Write dataframe to the file
-        for row in dataframe_to_rows(df, header=True, index=False):
-            ws.append(row)
-
-        # Make a table
+        rows = dataframe_to_rows(df, header=True, index=False)
+        ws.append(next(rows))
+        for row in rows:
+            for cell, value in zip(number_cells, row[2:]):
+                cell.value = value
+            ws.append(row[:2] + number_cells)
+
+        # Summation row
+        total = WriteOnlyCell(ws, value="Итого")
+        total.font = bold
+        totals = [total, None]
+        for col_number in range(3, y + 1):
+            cell = WriteOnlyCell(ws)
+            cell.number_format = number_format
+            if col_number >= start_summation_col:
+                column_letter = get_column_letter(col_number)
+                cell.value = f"=SUM({column_letter}{4}:{column_letter}{x + 3})"
+                cell.font = bold
+            totals.append(cell)
+        ws.append(totals[:y])
+
+        # Make a table. A write-only sheet cannot be read back, so the column
+        # headings and the autofilter are declared explicitly
+        table_ref = f"A3:{right_bound}{x + 4}"
         tab = Table(
             displayName=f"{self.config.table_display_name}",
-            ref=f"A3:{right_bound}{x + 4}",
+            ref=table_ref,
             totalsRowShown=True,
+            autoFilter=AutoFilter(ref=table_ref),
+            tableColumns=[
+                TableColumn(id=col_number, name=str(name))
+                for col_number, name in enumerate(df.columns, start=1)
+            ],
         )
 
         # Style the table
@@ -109,28 +166,14 @@ class Writer:
             showColumnStripes=True,
         )
         tab.tableStyleInfo = style
-        ws.add_table(tab)
-
-        # Format numbers in the table
-        for col in ws.iter_cols(min_col=3, max_col=y, min_row=4, max_row=x + 4):
-            for cell in col:
-                cell.number_format = numbers.builtin_format_code(3)
-
-        summation_row = ws[
-            f"{self.config.start_summation_row}{x + 4}" : f"{get_column_letter(y)}{x + 4}"
-        ]
-
-        for cell in summation_row[0]:
-            cell.value = (
-                f"=SUM({cell.column_letter}{4}:{cell.column_letter}{cell.row - 1})"
-            )
-            cell.font = Font(bold=True)
-
-        ws[f"A{x + 4}"] = "Итого"
-        ws[f"A{x + 4}"].font = Font(bold=True)
-
-        self.columns_best_fit(ws)
+        with warnings.catch_warnings():
+            # openpyxl warns about every write-only table, columns are set above
+            warnings.filterwarnings("ignore", "In write-only mode", UserWarning)
+            ws.add_table(tab)
 
         if fname is None:
             fname = f"{self.config.category}_{self.config.company_name}{self.config.report_period}.xlsx"
-        wb.save(self.destination_path.joinpath(f"{fname}"))
+        if hasattr(fname, "write"):
+            wb.save(fname)
+        else:
+            wb.save(self.destination_path.joinpath(f"{fname}"))
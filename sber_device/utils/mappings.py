@@ -1,4 +1,5 @@
 import re
+from functools import lru_cache
 
 # Шаблон поиска названий месяцев
 month_pattern = re.compile(r"Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec", re.I)
@@ -20,9 +21,12 @@ month_mapper = dict(
 )
 
 
+@lru_cache(maxsize=64)
 def replacer(s: str) -> str:
     """
     Функция, которая преобразует месяцы с английского языка на русский.
+    Замена выполняется за один проход регулярного выражения, результат
+    кэшируется: одна и та же дата запрашивается при каждом перезапуске страницы.
 
     Parameters
     ----------
@@ -34,9 +38,10 @@ def replacer(s: str) -> str:
     str
         Строка с преобразованным названием месяца.
     """
-    match = month_pattern.search(s)
+    return month_pattern.sub(_month_replacement, s)
 
-    if match is not None:
-        month = match.group(0)
-        s = s.replace(month, month_mapper.get(month, month))
-    return s
+
+def _month_replacement(match: re.Match) -> str:
+    # Шаблон регистронезависимый, а ключи словаря записаны как "Jan"
+    month = match.group(0)
+    return month_mapper.get(month.title(), month)